@@ -1,70 +1,650 @@
+import os
+import queue
 import threading
 import time
-from collections import deque, defaultdict
+import uuid
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import Future
 from dataclasses import dataclass
-from typing import Dict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
 
+_now_ns = time.monotonic_ns
+NS_PER_SECOND = 1_000_000_000
+MAX_FREE_BUFFERS_PER_SHARD = 64
 
-@dataclass
+
+def _identity(user_id: Hashable) -> Hashable:
+    return user_id
+
+
+def _wall_time(at_ns: int, now: int) -> float:
+    """Convert a monotonic ns deadline into a Unix timestamp for RateLimitResult."""
+    return time.time() + (at_ns - now) / NS_PER_SECOND
+
+
+@dataclass(slots=True, frozen=True)
 class RateLimitResult:
     allowed: bool
     remaining_requests: int
-    reset_time: float  # when the full quota will be available again
+    reset_time: float  # Unix timestamp when the full quota will be available again
     retry_after: float  # when the next request will be allowed
 
 
+class TimestampRing:
+    """Fixed-capacity ring buffer of monotonic ns request timestamps, oldest first."""
+
+    __slots__ = ("buf", "head", "count", "lock", "retired")
+
+    def __init__(self, buf: array):
+        self.buf = buf
+        self.head = 0
+        self.count = 0
+        self.lock = threading.Lock()
+        self.retired = False  # set once the sweeper drops it from the map
+
+
+class CommitterRing:
+    """Lock-free TimestampRing for rings owned by a single committer thread."""
+
+    __slots__ = ("buf", "head", "count")
+
+    def __init__(self, buf: array):
+        self.buf = buf
+        self.head = 0
+        self.count = 0
+
+
+Ring = Union[TimestampRing, CommitterRing]
+
+
+class RateLimiterShard:
+    """A slice of the user map; its lock is only needed to insert or drop users."""
+
+    __slots__ = ("lock", "user_timestamps", "last_sweep_ns", "max_requests", "free_buffers")
+
+    def __init__(self, max_requests: int):
+        self.lock = threading.Lock()
+        self.max_requests = max_requests
+        self.free_buffers: List[array] = []
+        self.user_timestamps: Dict[Hashable, TimestampRing] = {}
+        self.last_sweep_ns = _now_ns()
+
+    def new_ring(self) -> TimestampRing:
+        """Build a ring, reusing a recycled buffer when one is available (shard lock held)."""
+        if self.free_buffers:
+            return TimestampRing(self.free_buffers.pop())
+        return TimestampRing(array("q", [0]) * self.max_requests)
+
+    def retire_ring(self, ring: TimestampRing):
+        """Mark a ring removed from the map and recycle its buffer (shard and ring locks held)."""
+        ring.retired = True
+        if len(self.free_buffers) < MAX_FREE_BUFFERS_PER_SHARD:
+            self.free_buffers.append(ring.buf)
+
+
+def _make_evictor(capacity: int, window_ns: int) -> Callable[[Ring, int], None]:
+    """Build an eviction function with the limiter's fixed settings bound as closure constants."""
+
+    def evict_old_requests(ring: Ring, now: int):
+        """Remove timestamps that are outside the time window."""
+        threshold = now - window_ns
+        buf, head, count = ring.buf, ring.head, ring.count
+        if not count or buf[head] > threshold:
+            return
+
+        # timestamps are sorted, so binary search for the first one still in the window
+        end = head + count
+        if end <= capacity:
+            expired = bisect_right(buf, threshold, head, end) - head
+        else:
+            # occupied slots wrap around: [head, capacity) then [0, end - capacity)
+            expired = bisect_right(buf, threshold, head, capacity) - head
+            if expired == capacity - head:
+                expired += bisect_right(buf, threshold, 0, end - capacity)
+
+        ring.head = (head + expired) % capacity
+        ring.count = count - expired
+
+    return evict_old_requests
+
+
+def _make_admitter(capacity: int, window_ns: int) -> Callable[[Ring, int], Tuple[bool, int, int]]:
+    """Build the admission step: evict, append if there is room, report (allowed, count, oldest)."""
+    evict_old_requests = _make_evictor(capacity, window_ns)
+
+    def admit(ring: Ring, now: int) -> Tuple[bool, int, int]:
+        buf, head, count = ring.buf, ring.head, ring.count
+        if count and buf[head] <= now - window_ns:
+            evict_old_requests(ring, now)
+            head, count = ring.head, ring.count
+
+        allowed = count < capacity
+        if allowed:
+            buf[(head + count) % capacity] = now
+            count = ring.count = count + 1
+        return allowed, count, buf[head]
+
+    return admit
+
+
 class PaymentRateLimiter:
-    """Thread-safe sliding window rate limiter per user."""
+    """Thread-safe sliding window rate limiter per user.
+
+    Users are spread across shards. Looking up an existing user's ring is a
+    plain dict read; the shard lock is taken only when a new user is inserted,
+    and each ring carries its own lock for the admission itself.
+
+    Idle users are dropped by sweep_idle_users, run periodically by the
+    background sweeper. If no sweeper has visited a shard for two windows,
+    the next caller landing on it sweeps it inline.
+
+    key_func maps a user_id to the key stored in the map. By default the id
+    is used as is, so any hashable works; pass e.g. an int parser for numeric
+    string ids to store compact int keys instead.
+    """
+
+    def __init__(self, max_requests: int, window_seconds: int, num_shards: int = 16,
+                 key_func: Optional[Callable[[str], Hashable]] = None):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.window_ns = int(window_seconds * NS_PER_SECOND)
+        self.shards = [RateLimiterShard(max_requests) for _ in range(num_shards)]
+        self.key_func = key_func or _identity
+        self._evict_old_requests = _make_evictor(max_requests, self.window_ns)
+        self._admit = _make_admitter(max_requests, self.window_ns)
+        self.sweeper: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def is_payment_allowed(self, user_id: str) -> RateLimitResult:
+        """Returns whether the user can make a payment right now."""
+        now = _now_ns()
+        key = self.key_func(user_id)
+        shard = self._shard_for(key)
+        cap = self.max_requests
+
+        reset_ns = self._saturated_until(shard, key, now)
+        if not reset_ns:
+            # only the ring update itself happens under the lock
+            ring = self._acquire_ring(shard, key, now)
+            try:
+                allowed, count, oldest = self._admit(ring, now)
+            finally:
+                ring.lock.release()
+
+            reset_ns = oldest + self.window_ns
+            if allowed:
+                return RateLimitResult(
+                    allowed=True,
+                    remaining_requests=cap - count,
+                    reset_time=_wall_time(reset_ns, now),
+                    retry_after=0
+                )
+
+        return RateLimitResult(
+            allowed=False,
+            remaining_requests=0,
+            reset_time=_wall_time(reset_ns, now),
+            retry_after=(reset_ns - now) / NS_PER_SECOND
+        )
+
+    def is_payment_allowed_fast(self, user_id: str) -> bool:
+        """Same decision as is_payment_allowed, without building a RateLimitResult."""
+        now = _now_ns()
+        key = self.key_func(user_id)
+        shard = self._shard_for(key)
+        if self._saturated_until(shard, key, now):
+            return False
+
+        ring = self._acquire_ring(shard, key, now)
+        try:
+            return self._admit(ring, now)[0]
+        finally:
+            ring.lock.release()
+
+    def is_payment_allowed_batch(self, user_ids: List[str]) -> Tuple[List[bool], List[int]]:
+        """Admit a batch of payments, returning (allowed, remaining) lists in input order.
+
+        Each user's ring is locked once for all of their requests in the batch,
+        and no RateLimitResult objects are built.
+        """
+        now = _now_ns()
+        cap, admit = self.max_requests, self._admit
+        allowed = [False] * len(user_ids)
+        remaining = [0] * len(user_ids)
+
+        key_func = self.key_func
+        positions: Dict[Hashable, List[int]] = defaultdict(list)
+        for i, user_id in enumerate(user_ids):
+            positions[key_func(user_id)].append(i)
+
+        for key, indexes in positions.items():
+            ring = self._acquire_ring(self._shard_for(key), key, now)
+            try:
+                for i in indexes:
+                    allowed[i], count, _ = admit(ring, now)
+                    remaining[i] = cap - count
+            finally:
+                ring.lock.release()
+
+        return allowed, remaining
+
+    def _shard_for(self, key: Hashable) -> RateLimiterShard:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def _saturated_until(self, shard: RateLimiterShard, key: Hashable, now: int) -> int:
+        """Lock-free peek: when a full ring next frees a slot, or 0 if it may have room.
+
+        Users hammering an exhausted quota are rejected without any lock. A
+        concurrent admit can evict and append into the old head slot, so the
+        peek only trusts buf[head] if head, count and retired are unchanged
+        after the read; otherwise the caller takes the locked path.
+        """
+        ring = shard.user_timestamps.get(key)
+        if ring is None or ring.count < self.max_requests:
+            return 0
+        head = ring.head
+        reset_ns = ring.buf[head] + self.window_ns
+        # a retired ring's buffer may already belong to another user
+        if (reset_ns <= now or ring.head != head or ring.retired
+                or ring.count < self.max_requests):
+            return 0
+        return reset_ns
+
+    def _acquire_ring(self, shard: RateLimiterShard, key: Hashable, now: int) -> TimestampRing:
+        """Return the user's ring with its lock held, creating it if needed.
+
+        The ring is found without locking; the shard lock is only taken on a
+        miss. A ring retired by the sweeper in the meantime is skipped.
+        """
+        if now - shard.last_sweep_ns > 2 * self.window_ns:
+            self._sweep_shard(shard, now, only_if_stale=True)
+
+        while True:
+            ring = shard.user_timestamps.get(key)
+            if ring is None:
+                with shard.lock:
+                    ring = shard.user_timestamps.get(key)
+                    if ring is None:
+                        ring = shard.user_timestamps[key] = shard.new_ring()
+            ring.lock.acquire()
+            if not ring.retired:
+                return ring
+            ring.lock.release()
+
+    def reset_user_limits(self, user_id: str):
+        """Manually clear usage history for a user (e.g., by admin)."""
+        key = self.key_func(user_id)
+        shard = self._shard_for(key)
+        with shard.lock:
+            ring = shard.user_timestamps.pop(key, None)
+            if ring is not None:
+                with ring.lock:
+                    shard.retire_ring(ring)
+
+    def sweep_idle_users(self) -> int:
+        """Drop users with no requests left in the window; returns how many were removed."""
+        now = _now_ns()
+        return sum(self._sweep_shard(shard, now) for shard in self.shards)
+
+    def _sweep_shard(self, shard: RateLimiterShard, now: int, only_if_stale: bool = False) -> int:
+        """Drop idle users from one shard.
+
+        With only_if_stale the staleness check is repeated under the shard
+        lock, so callers that raced on an old last_sweep_ns don't all sweep.
+        """
+        removed = 0
+        with shard.lock:
+            if only_if_stale and now - shard.last_sweep_ns <= 2 * self.window_ns:
+                return 0
+            shard.last_sweep_ns = now
+            for key, ring in list(shard.user_timestamps.items()):
+                with ring.lock:
+                    self._evict_old_requests(ring, now)
+                    if ring.count == 0:
+                        del shard.user_timestamps[key]
+                        shard.retire_ring(ring)
+                        removed += 1
+        return removed
+
+    def start_sweeper(self) -> None:
+        """Start a daemon thread sweeping idle users every quarter window."""
+        if self.sweeper and self.sweeper.is_alive():
+            return
+        self.stop_event.clear()
+        self.sweeper = threading.Thread(target=self._sweep_loop, daemon=True)
+        self.sweeper.start()
+
+    def stop_sweeper(self, timeout_seconds: int = 30) -> None:
+        self.stop_event.set()
+        if self.sweeper:
+            self.sweeper.join(timeout=timeout_seconds)
+
+    def _sweep_loop(self) -> None:
+        while not self.stop_event.wait(self.window_seconds / 4):
+            self.sweep_idle_users()
+
+
+class RateLimitCommitter:
+    """The only thread allowed to touch one partition's rings, so they need no locks."""
+
+    def __init__(self):
+        self.requests: queue.SimpleQueue = queue.SimpleQueue()
+        self.rings: Dict[Hashable, CommitterRing] = {}
+        self.thread: Optional[threading.Thread] = None
+
+
+class CommitterRateLimiter:
+    """Sliding window limiter where each user partition has a single writer thread.
+
+    Callers hand (key, now) to their partition's committer over a SimpleQueue
+    and wait on a Future for the decision. Since a ring is only ever read and
+    written by its committer, admissions never contend on a lock. Committers
+    drop idle users when their queue stays empty for a quarter window, or
+    every two windows when they are never idle.
+
+    An error raised while admitting is handed to the caller's Future rather
+    than killing the committer. Once stop() is called new requests raise
+    RuntimeError; requests queued before it are still answered.
+    """
+
+    _RESET = -1  # sentinel "now" asking the committer to forget a user
+
+    def __init__(self, max_requests: int, window_seconds: int, num_committers: Optional[int] = None,
+                 key_func: Optional[Callable[[str], Hashable]] = None):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.window_ns = int(window_seconds * NS_PER_SECOND)
+        self.key_func = key_func or _identity
+        self._evict_old_requests = _make_evictor(max_requests, self.window_ns)
+        self._admit = _make_admitter(max_requests, self.window_ns)
+        self.committers = [RateLimitCommitter() for _ in range(num_committers or os.cpu_count() or 1)]
+        self.stopped = False
+        self.stop_lock = threading.Lock()  # nothing may be queued behind the stop sentinel
+
+        for committer in self.committers:
+            committer.thread = threading.Thread(target=self._commit_loop, args=(committer,), daemon=True)
+            committer.thread.start()
+
+    def is_payment_allowed(self, user_id: str) -> RateLimitResult:
+        """Returns whether the user can make a payment right now."""
+        now = _now_ns()
+        allowed, count, oldest = self._submit(self.key_func(user_id), now).result()
+
+        reset_ns = oldest + self.window_ns
+        if allowed:
+            return RateLimitResult(
+                allowed=True,
+                remaining_requests=self.max_requests - count,
+                reset_time=_wall_time(reset_ns, now),
+                retry_after=0
+            )
+
+        return RateLimitResult(
+            allowed=False,
+            remaining_requests=0,
+            reset_time=_wall_time(reset_ns, now),
+            retry_after=(reset_ns - now) / NS_PER_SECOND
+        )
+
+    def reset_user_limits(self, user_id: str):
+        """Manually clear usage history for a user (e.g., by admin)."""
+        self._submit(self.key_func(user_id), self._RESET).result()
+
+    def stop(self, timeout_seconds: int = 30) -> None:
+        with self.stop_lock:
+            self.stopped = True
+            for committer in self.committers:
+                committer.requests.put(None)
+        for committer in self.committers:
+            committer.thread.join(timeout=timeout_seconds)
+
+    def _submit(self, key: Hashable, now: int) -> Future:
+        future: Future = Future()
+        requests = self.committers[hash(key) % len(self.committers)].requests
+        with self.stop_lock:
+            if self.stopped:
+                raise RuntimeError("CommitterRateLimiter is stopped")
+            requests.put((key, now, future))
+        return future
+
+    def _commit_loop(self, committer: RateLimitCommitter) -> None:
+        rings, requests = committer.rings, committer.requests
+        cap, admit = self.max_requests, self._admit
+        last_sweep_ns = _now_ns()
+
+        while True:
+            try:
+                item = requests.get(timeout=self.window_seconds / 4)
+            except queue.Empty:
+                item = False
+            if item is None:
+                return
+            if not item or _now_ns() - last_sweep_ns > 2 * self.window_ns:
+                last_sweep_ns = self._drop_idle_users(rings)
+            if not item:
+                continue
+
+            key, now, future = item
+            try:
+                if now == self._RESET:
+                    rings.pop(key, None)
+                    future.set_result(None)
+                    continue
+
+                ring = rings.get(key)
+                if ring is None:
+                    ring = rings[key] = CommitterRing(array("q", [0]) * cap)
+                future.set_result(admit(ring, now))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _drop_idle_users(self, rings: Dict[Hashable, CommitterRing]) -> int:
+        """Forget users with nothing left in the window; returns the sweep time."""
+        now = _now_ns()
+        for key, ring in list(rings.items()):
+            self._evict_old_requests(ring, now)
+            if ring.count == 0:
+                del rings[key]
+        return now
+
+
+class TokenBucket:
+    """Per-user token bucket; its own lock keeps updates off the global map lock."""
+
+    __slots__ = ("tokens", "last_refill", "lock")
+
+    def __init__(self, capacity: int, now: int):
+        self.tokens = float(capacity)
+        self.last_refill = now
+        self.lock = threading.Lock()
+
+
+class TokenBucketRateLimiter:
+    """Token bucket rate limiter allowing bursts of up to max_requests per user.
+
+    Tokens refill continuously at max_requests / window_seconds per second.
+    The limiter-wide lock is only taken when a new user's bucket is created;
+    admissions lock just the caller's own bucket.
+    """
 
     def __init__(self, max_requests: int, window_seconds: int):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
+        self.refill_rate = max_requests / window_seconds
         self.lock = threading.Lock()
-        self.user_timestamps: Dict[str, deque] = defaultdict(deque)
+        self.buckets: Dict[str, TokenBucket] = {}
 
     def is_payment_allowed(self, user_id: str) -> RateLimitResult:
         """Returns whether the user can make a payment right now."""
-        now = time.time()
+        now = _now_ns()
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.setdefault(user_id, TokenBucket(self.max_requests, now))
+
+        with bucket.lock:
+            elapsed = max(0, now - bucket.last_refill) / NS_PER_SECOND
+            tokens = min(self.max_requests, bucket.tokens + elapsed * self.refill_rate)
+            bucket.last_refill = max(now, bucket.last_refill)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            bucket.tokens = tokens
+
+        reset_time = time.time() + (self.max_requests - tokens) / self.refill_rate
+        if not allowed:
+            return RateLimitResult(
+                allowed=False,
+                remaining_requests=0,
+                reset_time=reset_time,
+                retry_after=(1 - tokens) / self.refill_rate
+            )
 
+        return RateLimitResult(
+            allowed=True,
+            remaining_requests=int(tokens),
+            reset_time=reset_time,
+            retry_after=0
+        )
+
+    def reset_user_limits(self, user_id: str):
+        """Manually refill a user's bucket (e.g., by admin)."""
         with self.lock:
-            timestamps = self.user_timestamps[user_id]
+            self.buckets.pop(user_id, None)
 
-            self._evict_old_requests(timestamps, now)
 
-            if len(timestamps) >= self.max_requests:
-                oldest = timestamps[0]
-                retry_after = oldest + self.window_seconds - now
-                reset_time = oldest + self.window_seconds
+class SlidingWindowCounterLimiter:
+    """Approximate sliding window using two fixed-window counters per user.
 
-                return RateLimitResult(
-                    allowed=False,
-                    remaining_requests=0,
-                    reset_time=reset_time,
-                    retry_after=retry_after
-                )
+    Usage is estimated as prev_count * (share of the previous window still
+    inside the sliding window) + cur_count. Memory is three ints per user no
+    matter how large max_requests is, at the cost of exact sliding semantics.
+    """
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.window_ns = int(window_seconds * NS_PER_SECOND)
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Tuple[int, int, int]] = {}  # user_id -> (prev, cur, window index)
+
+    def is_payment_allowed(self, user_id: str) -> RateLimitResult:
+        """Returns whether the user can make a payment right now."""
+        now = _now_ns()
+        window_index, offset = divmod(now, self.window_ns)
 
-            # Accept the payment
-            timestamps.append(now)
-            remaining = self.max_requests - len(timestamps)
-            reset_time = timestamps[0] + self.window_seconds
+        with self.lock:
+            prev, cur, index = self.counters.get(user_id, (0, 0, window_index))
+            if index != window_index:
+                prev = cur if index == window_index - 1 else 0
+                cur = 0
 
+            estimate = prev * (1 - offset / self.window_ns) + cur
+            allowed = estimate < self.max_requests
+            if allowed:
+                cur += 1
+            self.counters[user_id] = (prev, cur, window_index)
+
+        reset_time = _wall_time((window_index + (2 if cur else 1)) * self.window_ns, now)
+        if not allowed:
             return RateLimitResult(
-                allowed=True,
-                remaining_requests=remaining,
+                allowed=False,
+                remaining_requests=0,
                 reset_time=reset_time,
-                retry_after=0
+                retry_after=self._retry_after_ns(prev, cur, offset) / NS_PER_SECOND
             )
 
-    def _evict_old_requests(self, timestamps: deque, now: float):
-        """Remove timestamps that are outside the time window."""
-        threshold = now - self.window_seconds
-        while timestamps and timestamps[0] <= threshold:
-            timestamps.popleft()
+        return RateLimitResult(
+            allowed=True,
+            remaining_requests=max(0, int(self.max_requests - estimate - 1)),
+            reset_time=reset_time,
+            retry_after=0
+        )
+
+    def _retry_after_ns(self, prev: int, cur: int, offset: int) -> float:
+        """Time until the estimate drops back under max_requests."""
+        if cur < self.max_requests:
+            # previous window's weight has to decay enough within this window
+            wait = self.window_ns * (1 - (self.max_requests - cur) / prev) - offset
+        else:
+            # this window is already full on its own: wait for it to become "previous"
+            wait = self.window_ns - offset + self.window_ns * (1 - self.max_requests / cur)
+        return max(0.0, wait)
 
     def reset_user_limits(self, user_id: str):
         """Manually clear usage history for a user (e.g., by admin)."""
         with self.lock:
-            self.user_timestamps[user_id].clear()
+            self.counters.pop(user_id, None)
+
+
+# Sliding window over a sorted set scored by Redis server time in microseconds.
+# KEYS[1] = user key, ARGV = {max_requests, window_us, unique member id}.
+# Returns {allowed, remaining, oldest_us, now_us}.
+SLIDING_WINDOW_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local max_requests = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < max_requests then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], math.ceil(window / 1000))
+    count = count + 1
+    allowed = 1
+end
+
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local oldest_us = now
+if oldest[2] then
+    oldest_us = tonumber(oldest[2])
+end
+return {allowed, max_requests - count, oldest_us, now}
+"""
+
+
+class RedisPaymentRateLimiter:
+    """Sliding window rate limiter shared by all app servers through Redis.
+
+    The check and the write run in one Lua script, so each decision is atomic
+    on the Redis side and costs a single round trip. Timestamps come from the
+    Redis server clock, so app servers with skewed clocks still agree.
+    """
+
+    def __init__(self, redis_client: Any, max_requests: int, window_seconds: int,
+                 key_prefix: str = "rate_limit:"):
+        self.redis = redis_client
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.window_us = int(window_seconds * 1_000_000)
+        self.key_prefix = key_prefix
+        # register_script caches the SHA and uses EVALSHA, falling back to EVAL once
+        self.script = redis_client.register_script(SLIDING_WINDOW_LUA)
+
+    def is_payment_allowed(self, user_id: str) -> RateLimitResult:
+        """Returns whether the user can make a payment right now."""
+        allowed, remaining, oldest_us, now_us = self.script(
+            keys=[self.key_prefix + user_id],
+            args=[self.max_requests, self.window_us, uuid.uuid4().hex],
+        )
+        reset_us = int(oldest_us) + self.window_us
+
+        # reset_time here is a Unix timestamp taken from the Redis clock
+        return RateLimitResult(
+            allowed=bool(allowed),
+            remaining_requests=int(remaining),
+            reset_time=reset_us / 1_000_000,
+            retry_after=0 if allowed else (reset_us - int(now_us)) / 1_000_000
+        )
+
+    def reset_user_limits(self, user_id: str):
+        """Manually clear usage history for a user (e.g., by admin)."""
+        self.redis.delete(self.key_prefix + user_id)
 
 
 # === Example Usage ===
@@ -77,4 +657,17 @@ if __name__ == "__main__":
         time.sleep(1)
 
     result = limiter.is_payment_allowed("user456")
-    print(f"Different user: {result}")
\ No newline at end of file
+    print(f"Different user: {result}")
+
+    allowed, remaining = limiter.is_payment_allowed_batch(["user456", "user456", "user789"])
+    print(f"Batch: Allowed={allowed}, Remaining={remaining}")
+
+    bucket_limiter = TokenBucketRateLimiter(max_requests=3, window_seconds=3)
+    for i in range(5):
+        result = bucket_limiter.is_payment_allowed("user789")
+        print(f"Token bucket {i+1}: Allowed={result.allowed}, Remaining={result.remaining_requests}, Retry after={round(result.retry_after, 2)}s")
+
+    counter_limiter = SlidingWindowCounterLimiter(max_requests=3, window_seconds=60)
+    for i in range(4):
+        result = counter_limiter.is_payment_allowed("user789")
+        print(f"Window counter {i+1}: Allowed={result.allowed}, Remaining={result.remaining_requests}, Retry after={round(result.retry_after, 2)}s")
\ No newline at end of file
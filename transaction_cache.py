@@ -1,10 +1,14 @@
 import threading
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
+_now_ns = time.monotonic_ns
 
-@dataclass
+
+@dataclass(slots=True)
 class Transaction:
     id: str
     amount: float
@@ -14,107 +18,107 @@ class Transaction:
     metadata: Dict[str, Any]
 
 
-class Node:
-    def __init__(self, txn: Transaction, expiry: datetime):
-        self.txn = txn
-        self.expiry = expiry
-        self.prev = None
-        self.next = None
+class CacheShard:
+    """One independently locked LRU slice of the cache."""
+
+    __slots__ = ("lock", "map", "max_size", "hits", "misses")
+
+    def __init__(self, max_size: int):
+        self.lock = threading.Lock()
+        # txn_id → (txn, expiry in monotonic ns), ordered LRU first / MRU last
+        self.map: OrderedDict[str, Tuple[Transaction, int]] = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
 
 
 class TransactionCache:
-    def __init__(self, max_size, ttl_seconds):
+    """LRU + TTL transaction cache, striped over independently locked shards.
+
+    The default single shard gives exact global LRU and holds exactly
+    max_size entries. With num_shards > 1 each shard gets a fixed slice of
+    max_size and evicts its own least recently used entry, so LRU order is
+    only approximate and an unevenly hashed shard can evict before the cache
+    as a whole is full. Stripe only when max_size is far above num_shards.
+
+    Expiry is lazy: an expired entry is dropped when it is next read or when
+    it reaches the LRU end of a full shard; there is no background sweep.
+    Until then it still counts towards max_size, which keeps memory bounded.
+    """
+
+    def __init__(self, max_size, ttl_seconds, num_shards: int = 1):
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
-        self.map = {}  # txn_id → Node
-        self.head = None  # MRU
-        self.tail = None  # LRU
-        self.lock = threading.Lock()  # for thread safety
+        self.ttl_ns = int(ttl_seconds * 1_000_000_000)  # expiry math never touches datetime
+
+        # per-shard quotas sum to max_size; each shard enforces only its own
+        num_shards = max(1, min(num_shards, max_size))
+        base, extra = divmod(max_size, num_shards)
+        self.shards = [CacheShard(base + (1 if i < extra else 0)) for i in range(num_shards)]
 
     def put(self, txn: Transaction):
-        with self.lock:
-            now = datetime.now()
-            expiry = now + timedelta(seconds=self.ttl_seconds)
-
-            if txn.id in self.map:
-                node = self.map[txn.id]
-                node.txn = txn
-                node.expiry = expiry
-                self._move_to_front(node)
-            else:
-                if len(self.map) >= self.max_size:
-                    self._evict_lru()
-
-                node = Node(txn, expiry)
-                self._add_to_front(node)
-                self.map[txn.id] = node
+        expiry = _now_ns() + self.ttl_ns
+        shard = self._shard_for(txn.id)
+        with shard.lock:
+            shard.map[txn.id] = (txn, expiry)
+            shard.map.move_to_end(txn.id)
+            while len(shard.map) > shard.max_size:
+                shard.map.popitem(last=False)
 
     def get(self, txn_id: str) -> Optional[Transaction]:
-        with self.lock:
-            node = self.map.get(txn_id)
-            now = datetime.now()
+        now = _now_ns()
+        shard = self._shard_for(txn_id)
+        with shard.lock:
+            entry = shard.map.get(txn_id)
 
-            if not node:
+            if not entry:
+                shard.misses += 1
                 return None
 
-            if node.expiry < now:
-                self._remove_node(node)
-                del self.map[txn_id]
+            txn, expiry = entry
+            if expiry < now:
+                shard.map.pop(txn_id, None)
+                shard.misses += 1
                 return None
 
-            self._move_to_front(node)
-            return node.txn
+            shard.map.move_to_end(txn_id)
+            shard.hits += 1
+            return txn
 
     def update_status(self, txn_id: str, new_status: str) -> bool:
-        with self.lock:
-            node = self.map.get(txn_id)
-            now = datetime.now()
-
-            if not node or node.expiry < now:
-                if node:
-                    self._remove_node(node)
-                    del self.map[txn_id]
+        now = _now_ns()
+        shard = self._shard_for(txn_id)
+        with shard.lock:
+            entry = shard.map.get(txn_id)
+
+            if not entry or entry[1] < now:
+                if entry:
+                    shard.map.pop(txn_id, None)
                 return False
 
-            node.txn.status = new_status
-            self._move_to_front(node)
+            # mutate the cached object in place; a status change is not a read,
+            # so it does not refresh the entry's LRU position
+            entry[0].status = new_status
             return True
 
-    def _evict_lru(self):
-        if self.tail:
-            lru_id = self.tail.txn.id
-            self._remove_node(self.tail)
-            del self.map[lru_id]
-
-    def _add_to_front(self, node: Node):
-        node.prev = None
-        node.next = self.head
-        if self.head:
-            self.head.prev = node
-        self.head = node
-        if not self.tail:
-            self.tail = node
-
-    def _remove_node(self, node: Node):
-        if node.prev:
-            node.prev.next = node.next
-        else:
-            self.head = node.next
-
-        if node.next:
-            node.next.prev = node.prev
-        else:
-            self.tail = node.prev
-
-        node.prev = node.next = None
-
-    def _move_to_front(self, node: Node):
-        self._remove_node(node)
-        self._add_to_front(node)
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Advisory counters read without locking; totals may lag in-flight operations."""
+        hits = misses = current_size = 0
+        for shard in self.shards:
+            hits += shard.hits
+            misses += shard.misses
+            current_size += len(shard.map)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "current_size": current_size,
+            "max_size": self.max_size,
+        }
+
+    def _shard_for(self, txn_id: str) -> CacheShard:
+        return self.shards[hash(txn_id) % len(self.shards)]
 
 if __name__ == "__main__":
-    import time
-
     cache = TransactionCache(max_size=2, ttl_seconds=2)  # 2 items max, 2s TTL
 
     txn1 = Transaction("txn1", 100.0, "USD", "pending", datetime.now(), {"user": "u1"})
@@ -145,3 +149,5 @@ if __name__ == "__main__":
 
     print("[8] Get txn1 → should be expired")
     print("txn1:", cache.get("txn1"))
+
+    print("Stats:", cache.get_cache_stats())
\ No newline at end of file
@@ -19,26 +19,34 @@ FOLLOW-UP QUESTIONS:
 - How do you scale webhook delivery across multiple workers?
 """
 
+import binascii
 import hashlib
+import heapq
 import hmac
+import itertools
 import json
 import random
 import threading
 import time
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from enum import Enum
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import IntFlag
+from typing import Dict, List, Optional, Tuple
 
 
-class WebhookStatus(Enum):
-    PENDING = "pending"
-    DELIVERED = "delivered"
-    FAILED = "failed"
-    EXPIRED = "expired"
+class WebhookStatus(IntFlag):
+    PENDING = 1
+    DELIVERED = 2
+    FAILED = 4
+    EXPIRED = 8
 
+    def __str__(self) -> str:
+        return f"{type(self).__name__}.{self.name}"
 
-@dataclass
+
+@dataclass(slots=True)
 class WebhookEvent:
     id: str
     url: str
@@ -47,9 +55,10 @@ class WebhookEvent:
     created_at: datetime
     max_attempts: int = 5
     timeout_seconds: int = 30
+    _payload_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class DeliveryAttempt:
     attempt_number: int
     attempted_at: datetime
@@ -59,21 +68,54 @@ class DeliveryAttempt:
     success: bool
 
 
+@dataclass(slots=True)
+class WebhookRecord:
+    """All delivery state for one webhook, so a single dict probe finds it."""
+    event: WebhookEvent
+    status: WebhookStatus
+    attempts: List[DeliveryAttempt] = field(default_factory=list)
+    next_retry_ts: Optional[float] = None  # time.monotonic() when a failed webhook may retry
+    in_flight: bool = False  # an attempt is claimed and its HTTP request not yet recorded
+
+
+TERMINAL_MASK = WebhookStatus.DELIVERED | WebhookStatus.EXPIRED
+
+# Simulated endpoint responses: 70% success, the rest split across failure scenarios
+SIMULATED_RESPONSES = (
+    (200, '{"status": "success"}', None),
+    (500, '{"error": "internal_server_error"}', "Server Error"),
+    (404, '{"error": "not_found"}', "Endpoint Not Found"),
+    (0, None, "Connection Timeout"),
+    (503, '{"error": "service_unavailable"}', "Service Unavailable"),
+)
+SIMULATED_WEIGHTS = (0.7, 0.075, 0.075, 0.075, 0.075)
+SIMULATED_OUTCOME_COUNT = 10_000
+
+HMAC_CACHE_MAX_SIZE = 1024  # keyed HMACs kept per system; bounds memory under secret churn
+
+
 class WebhookDeliverySystem:
     """Reliable webhook delivery with retries and failure handling."""
 
-    def __init__(self, max_concurrent_deliveries: int = 10):
+    def __init__(self, max_concurrent_deliveries: int = 10, simulated_latency_s: float = 0.0):
         """
         Initialize webhook delivery system.
         
         Args:
             max_concurrent_deliveries: Maximum concurrent webhook deliveries
+            simulated_latency_s: Network delay added to each simulated request (0 disables it)
         """
-        self.webhooks: Dict[str, WebhookEvent] = {}
-        self.webhook_status: Dict[str, WebhookStatus] = {}
-        self.delivery_attempts: Dict[str, List[DeliveryAttempt]] = {}
+        self.records: Dict[str, WebhookRecord] = {}
+        self._retry_heap: List[Tuple[float, str]] = []  # (next_retry_ts, webhook_id), stale entries skipped on pop
+        self._hmac_cache: OrderedDict[str, hmac.HMAC] = OrderedDict()  # secret → keyed HMAC, LRU order
+        self._hmac_cache_max = HMAC_CACHE_MAX_SIZE
+        self._hmac_lock = threading.Lock()
         self.max_concurrent = max_concurrent_deliveries
+        self._simulated_latency_s = simulated_latency_s
         self.lock = threading.Lock()
+        # Draw simulated responses up front; each request just takes the next one
+        self._sim_outcomes = random.choices(SIMULATED_RESPONSES, SIMULATED_WEIGHTS, k=SIMULATED_OUTCOME_COUNT)
+        self._sim_idx = itertools.count()
 
     def enqueue_webhook(self, event: WebhookEvent) -> str:
         """
@@ -86,9 +128,7 @@ class WebhookDeliverySystem:
             Webhook delivery ID for tracking
         """
         with self.lock:
-            self.webhooks[event.id] = event
-            self.webhook_status[event.id] = WebhookStatus.PENDING
-            self.delivery_attempts[event.id] = []
+            self.records[event.id] = WebhookRecord(event=event, status=WebhookStatus.PENDING)
         return event.id
 
     def deliver_webhook(self, webhook_id: str) -> bool:
@@ -101,32 +141,52 @@ class WebhookDeliverySystem:
         Returns:
             True if delivery successful, False otherwise
         """
-        webhook = self.webhooks.get(webhook_id)
-        if not webhook:
+        record = self.records.get(webhook_id)
+        if record is None:
             return False
 
-        # Check if already delivered or expired
-        status = self.webhook_status.get(webhook_id)
-        if status in [WebhookStatus.DELIVERED, WebhookStatus.EXPIRED]:
-            return status == WebhookStatus.DELIVERED
+        # Check status and attempt count and claim the attempt in one lock hold,
+        # so concurrent callers can't both send the same webhook
+        webhook = record.event
+        with self.lock:
+            # Check if already delivered or expired
+            if record.status & TERMINAL_MASK:
+                return record.status == WebhookStatus.DELIVERED
+            if record.in_flight:
+                return False
+
+            attempt_number = len(record.attempts) + 1
+
+            # Check if max attempts exceeded
+            if attempt_number > webhook.max_attempts:
+                record.status = WebhookStatus.EXPIRED
+                record.next_retry_ts = None
+                return False
 
-        # Get current attempt count
-        attempts = self.delivery_attempts.get(webhook_id, [])
-        attempt_number = len(attempts) + 1
+            record.in_flight = True
 
-        # Check if max attempts exceeded
-        if attempt_number > webhook.max_attempts:
+        try:
+            return self._attempt_delivery(record, webhook_id, attempt_number)
+        except BaseException:
             with self.lock:
-                self.webhook_status[webhook_id] = WebhookStatus.EXPIRED
-            return False
+                record.in_flight = False
+            raise
+
+    def _attempt_delivery(self, record: WebhookRecord, webhook_id: str, attempt_number: int) -> bool:
+        """Send one claimed attempt and record its outcome, releasing the claim."""
+        webhook = record.event
 
         # Prepare payload and signature
-        payload_str = json.dumps(webhook.payload)
-        signature = self._sign_payload(payload_str, webhook.secret)
+        # Payload never changes between retries, so serialize it once
+        payload_bytes = webhook._payload_bytes
+        if payload_bytes is None:
+            payload_bytes = json.dumps(webhook.payload, separators=(',', ':')).encode('utf-8')
+            webhook._payload_bytes = payload_bytes
+        signature = self._sign_payload(payload_bytes, webhook.secret)
 
         # Make HTTP request
         status_code, response_body, error_message = self._make_http_request(
-            webhook.url, webhook.payload, signature, webhook.timeout_seconds
+            webhook.url, payload_bytes, signature, webhook.timeout_seconds
         )
 
         # Record attempt
@@ -139,97 +199,125 @@ class WebhookDeliverySystem:
             success=status_code == 200
         )
 
+        if attempt.success:
+            with self.lock:
+                record.attempts.append(attempt)
+                record.status = WebhookStatus.DELIVERED
+                record.next_retry_ts = None
+                record.in_flight = False
+            return True
+
+        # The last allowed attempt failed: expire now instead of scheduling a retry that can't happen
+        if attempt_number >= webhook.max_attempts:
+            with self.lock:
+                record.attempts.append(attempt)
+                record.status = WebhookStatus.EXPIRED
+                record.next_retry_ts = None
+                record.in_flight = False
+            return False
+
+        # Backoff is computed before taking the lock so the critical section is only record/heap writes
+        next_retry = self._calculate_next_retry_time(attempt_number, time.monotonic())
         with self.lock:
-            self.delivery_attempts[webhook_id].append(attempt)
+            record.attempts.append(attempt)
+            record.status = WebhookStatus.FAILED
+            record.next_retry_ts = next_retry
+            record.in_flight = False
+            heapq.heappush(self._retry_heap, (next_retry, webhook_id))
+        return False
+
+    def deliver_batch(self, webhook_ids: List[str]) -> Dict[str, bool]:
+        """
+        Deliver several webhooks concurrently.
 
-            if attempt.success:
-                self.webhook_status[webhook_id] = WebhookStatus.DELIVERED
-                return True
-            else:
-                self.webhook_status[webhook_id] = WebhookStatus.FAILED
-                return False
+        Deliveries are I/O-bound, so up to max_concurrent_deliveries run at
+        once on a thread pool instead of one blocking request after another.
+
+        Returns:
+            Mapping of webhook ID to delivery success
+        """
+        unique_ids = list(dict.fromkeys(webhook_ids))  # never deliver one webhook twice in parallel
+        if not unique_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrent, len(unique_ids))) as pool:
+            return dict(zip(unique_ids, pool.map(self.deliver_webhook, unique_ids)))
 
     def get_webhook_status(self, webhook_id: str) -> Optional[WebhookStatus]:
         """Get current status of webhook delivery."""
-        return self.webhook_status.get(webhook_id)
+        record = self.records.get(webhook_id)
+        return record.status if record else None
 
     def get_delivery_attempts(self, webhook_id: str) -> List[DeliveryAttempt]:
         """Get all delivery attempts for a webhook."""
-        return self.delivery_attempts.get(webhook_id, [])
+        record = self.records.get(webhook_id)
+        return record.attempts if record else []
 
     def retry_failed_webhooks(self) -> int:
         """Retry all failed webhooks that are eligible for retry."""
-        retried_count = 0
-        current_time = datetime.now()
-
-        for webhook_id, status in self.webhook_status.items():
-            if status != WebhookStatus.FAILED:
-                continue
-
-            webhook = self.webhooks.get(webhook_id)
-            attempts = self.delivery_attempts.get(webhook_id, [])
-
-            if not webhook or not attempts:
-                continue
+        now = time.monotonic()
 
-            # Check if we can retry (haven't exceeded max attempts)
-            if len(attempts) >= webhook.max_attempts:
-                with self.lock:
-                    self.webhook_status[webhook_id] = WebhookStatus.EXPIRED
-                continue
+        # Pop only the retries whose backoff has elapsed; an entry is stale (lazy
+        # deletion) once the webhook was delivered, expired or rescheduled.
+        retry_ids = []
+        with self.lock:
+            heap = self._retry_heap
+            while heap and heap[0][0] <= now:
+                next_retry, webhook_id = heapq.heappop(heap)
+                record = self.records.get(webhook_id)
+                if record is None or record.next_retry_ts != next_retry:
+                    continue
 
-            # Check if enough time has passed for retry (exponential backoff)
-            last_attempt = attempts[-1]
-            next_retry_time = self._calculate_next_retry_time(len(attempts))
+                # Check if we can retry (haven't exceeded max attempts)
+                if len(record.attempts) >= record.event.max_attempts:
+                    record.status = WebhookStatus.EXPIRED
+                    record.next_retry_ts = None
+                    continue
 
-            if current_time >= next_retry_time:
-                if self.deliver_webhook(webhook_id):
-                    retried_count += 1
+                retry_ids.append(webhook_id)
 
-        return retried_count
+        return sum(self.deliver_batch(retry_ids).values())
 
-    def _calculate_next_retry_time(self, attempt_number: int) -> datetime:
+    def _calculate_next_retry_time(self, attempt_number: int, now: float) -> float:
         """Calculate when to retry based on attempt number (exponential backoff)."""
         # Exponential backoff: 1s, 2s, 4s, 8s, 16s...
         base_delay = 1
         max_delay = 300  # 5 minutes max
         delay = min(base_delay * (2 ** (attempt_number - 1)), max_delay)
-        return datetime.now() + timedelta(seconds=delay)
+        return now + delay
 
-    def _sign_payload(self, payload: str, secret: str) -> str:
+    def _sign_payload(self, payload: bytes, secret: str) -> bytes:
         """Generate HMAC signature for webhook payload."""
-        return hmac.new(
-            secret.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        # Key-pad derivation happens once per secret; copying the keyed state is cheap
+        cache = self._hmac_cache
+        with self._hmac_lock:
+            keyed = cache.get(secret)
+            if keyed is None:
+                keyed = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+                cache[secret] = keyed
+                if len(cache) > self._hmac_cache_max:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(secret)
+            h = keyed.copy()
+        h.update(payload)
+        return binascii.hexlify(h.digest())  # ASCII bytes, ready for the signature header
 
-    def _make_http_request(self, url: str, payload: Dict, signature: str, timeout: int) -> tuple:
+    def _make_http_request(self, url: str, payload: bytes, signature: bytes, timeout: int) -> tuple:
         """Make HTTP request to webhook endpoint."""
         try:
             # Simulate HTTP request for interview purposes
-            time.sleep(0.1)  # Simulate network delay
+            if self._simulated_latency_s:
+                time.sleep(self._simulated_latency_s)  # Simulate network delay
 
             # Simulate different response scenarios
-            success_rate = 0.7  # 70% success rate for demo
-            if random.random() < success_rate:
-                return (200, '{"status": "success"}', None)
-            else:
-                # Simulate various failure scenarios
-                scenarios = [
-                    (500, '{"error": "internal_server_error"}', "Server Error"),
-                    (404, '{"error": "not_found"}', "Endpoint Not Found"),
-                    (0, None, "Connection Timeout"),
-                    (503, '{"error": "service_unavailable"}', "Service Unavailable")
-                ]
-                return random.choice(scenarios)
+            return self._sim_outcomes[next(self._sim_idx) % SIMULATED_OUTCOME_COUNT]
         except Exception as e:
             return (0, None, str(e))
 
 
 # Example usage and test cases
 if __name__ == "__main__":
-    delivery_system = WebhookDeliverySystem(max_concurrent_deliveries=5)
+    delivery_system = WebhookDeliverySystem(max_concurrent_deliveries=5, simulated_latency_s=0.1)
 
     # Create test webhook
     webhook = WebhookEvent(
@@ -261,6 +349,22 @@ if __name__ == "__main__":
     attempts = delivery_system.get_delivery_attempts(delivery_id)
     print(f"Attempts: {len(attempts)}")
 
+    # Deliver a batch concurrently
+    batch_ids = [
+        delivery_system.enqueue_webhook(WebhookEvent(
+            id=f"webhook_batch_{i}",
+            url="https://merchant.example.com/webhooks/payment",
+            payload={"event": "payment.completed", "payment_id": f"pay_{i}"},
+            secret="webhook_secret_key",
+            created_at=datetime.now()
+        ))
+        for i in range(10)
+    ]
+    start = time.perf_counter()
+    results = delivery_system.deliver_batch(batch_ids)
+    elapsed = time.perf_counter() - start
+    print(f"Batch delivered {sum(results.values())}/{len(results)} in {elapsed:.2f}s")
+
     # Retry failed webhooks
     retried_count = delivery_system.retry_failed_webhooks()
     print(f"Retried {retried_count} webhooks")